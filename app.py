@@ -1,11 +1,15 @@
 import warnings
 warnings.filterwarnings("ignore", message=".*ScriptRunContext.*")
 
+import threading
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import altair as alt
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, wait
 import database
 import weather_api
 import numpy as np
@@ -19,8 +23,94 @@ st.set_page_config(
 )
 
 # Initialize components
-db = database.WeatherDatabase()
-weather = weather_api.WeatherAPI(use_mock=True)
+@st.cache_resource
+def get_db():
+    """Shared database instance, created once per server process"""
+    return database.WeatherDatabase()
+
+
+@st.cache_resource
+def get_api(use_mock, api_key=None):
+    """Shared weather API client per (mode, key) combination"""
+    return weather_api.WeatherAPI(use_mock=use_mock, api_key=api_key)
+
+
+# Cached read queries - the leading underscore keeps Streamlit from hashing the db
+@st.cache_data(ttl=60)
+def load_dashboard_snapshot(_db, city, days):
+    return _db.get_dashboard_snapshot(city, days)
+
+
+@st.cache_data(ttl=60)
+def load_description_counts(_db, city, days):
+    return _db.get_description_counts(city, days)
+
+
+@st.cache_data(ttl=60)
+def load_wind_speed_histogram(_db, city, days):
+    return _db.get_wind_speed_histogram(city, days)
+
+
+# total_records comes from the (cached) database stats, so the list refreshes along with them;
+# the sidebar buttons clear both right away
+@st.cache_data(ttl=300)
+def load_all_cities(_db, total_records):
+    return _db.get_all_cities()
+
+
+@st.cache_data(ttl=300)
+def load_database_stats(_db):
+    return _db.get_database_stats()
+
+
+@st.cache_data(ttl=60, max_entries=32)
+def compute_trend(temperatures):
+    """Linear trend over the temperature series, cached on the array contents"""
+    # Too few points for a meaningful trend
+    if len(temperatures) < 3:
+        return None
+
+    # Closed-form least squares: slope = cov(x, y) / var(x)
+    x = np.arange(len(temperatures), dtype=np.float64)
+    y = np.asarray(temperatures, dtype=np.float64)
+    xm, ym = x.mean(), y.mean()
+    slope = ((x - xm) * (y - ym)).sum() / ((x - xm) ** 2).sum()
+    return slope * x + (ym - slope * xm)
+
+
+@st.cache_resource
+def get_executor():
+    """Background pool for prefetching historical queries"""
+    return ThreadPoolExecutor(max_workers=2)
+
+
+def prefetch(fn, *args):
+    """Run fn on the prefetch pool with this script run's context attached"""
+    ctx = get_script_run_ctx()
+
+    def run():
+        # Each task attaches its own run's context, replacing any earlier one
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+
+    return get_executor().submit(run)
+
+
+# Stored readings newer than this are shown instead of fetching current weather again
+LATEST_READING_MAX_AGE = timedelta(minutes=10)
+
+# Emoji shown next to each weather description
+WEATHER_EMOJIS = {
+    "Clear": "☀️",
+    "Cloudy": "☁️",
+    "Rain": "🌧️",
+    "Snow": "❄️",
+    "Fog": "🌫️",
+    "Thunderstorm": "⛈️"
+}
+
+db = get_db()
+weather = get_api(True)
 
 # Custom CSS for better styling
 st.markdown("""
@@ -50,6 +140,7 @@ if st.sidebar.button("🗃️ Generate Sample Data"):
     try:
         with st.spinner("Generating sample data... This may take a few seconds."):
             db.generate_sample_data(days=30, records_per_day=3)
+        st.cache_data.clear()
         st.sidebar.success("Sample data generated successfully!")
     except Exception as e:
         st.sidebar.error(f"Error generating sample data: {e}")
@@ -57,13 +148,15 @@ if st.sidebar.button("🗃️ Generate Sample Data"):
 if st.sidebar.button("🧹 Clean Old Data"):
     try:
         deleted_count = db.delete_old_data(days_old=60)
+        st.cache_data.clear()
         st.sidebar.success(f"Deleted {deleted_count} old records")
     except Exception as e:
         st.sidebar.error(f"Error cleaning old data: {e}")
 
 # Database statistics
+db_stats = {}
 try:
-    db_stats = db.get_database_stats()
+    db_stats = load_database_stats(db)
     if db_stats:
         st.sidebar.markdown("---")
         st.sidebar.subheader("Database Stats")
@@ -74,7 +167,7 @@ except Exception as e:
 
 # City selection
 try:
-    cities = db.get_all_cities()
+    cities = load_all_cities(db, db_stats.get('total_records'))
     if not cities:
         st.error("❌ No weather data available. Please generate sample data first.")
         st.stop()
@@ -92,17 +185,33 @@ use_real_api = st.sidebar.checkbox("Use Real Weather API", value=False)
 if use_real_api:
     api_key = st.sidebar.text_input("OpenWeatherMap API Key", type="password")
     if api_key:
-        weather = weather_api.WeatherAPI(use_mock=False, api_key=api_key)
+        weather = get_api(False, api_key)
     else:
         st.sidebar.warning("Please enter your API key")
 
+# Start the historical queries now so they run while current weather is fetched and rendered
+snapshot_future = prefetch(load_dashboard_snapshot, db, selected_city, days)
+
 # Main content
 st.markdown(f'<div class="main-header">Weather Dashboard - {selected_city}</div>', unsafe_allow_html=True)
 st.markdown("---")
 
 # Get current weather
 try:
-    current_weather = weather.get_current_weather(selected_city)
+    # Uncached, so the reading inserted on the previous rerun is seen straight away
+    latest = db.get_latest_reading(selected_city)
+    reuse_latest = False
+    if not use_real_api and latest is not None:
+        age = datetime.now(timezone.utc).replace(tzinfo=None) - latest['timestamp']
+        reuse_latest = timedelta(0) <= age <= LATEST_READING_MAX_AGE
+
+    if reuse_latest:
+        current_weather = latest
+    else:
+        current_weather = weather.get_current_weather(selected_city)
+
+    # Seeded by city so the delta stays put across reruns and leaves the global RNG alone
+    temperature_delta = random.Random(selected_city).choice(('-2°C', '-1°C', '+1°C', '+2°C'))
 
     # Display current weather in cards
     col1, col2, col3, col4 = st.columns(4)
@@ -112,7 +221,7 @@ try:
         st.metric(
             label="🌡️ Temperature",
             value=f"{current_weather['temperature']}°C",
-            delta=f"{random.choice(['-2°C', '-1°C', '+1°C', '+2°C'])} from yesterday"
+            delta=f"{temperature_delta} from yesterday"
         )
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -141,182 +250,181 @@ try:
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Weather description with emoji
-    weather_emojis = {
-        "Clear": "☀️",
-        "Cloudy": "☁️",
-        "Rain": "🌧️",
-        "Snow": "❄️",
-        "Fog": "🌫️",
-        "Thunderstorm": "⛈️"
-    }
-    emoji = weather_emojis.get(current_weather['description'], "🌤️")
+    emoji = WEATHER_EMOJIS.get(current_weather['description'], "🌤️")
 
     st.subheader(f"{emoji} Current Conditions: {current_weather['description']}")
 
-    # Store current weather in database
-    try:
-        db.insert_weather_data(
-            current_weather['city'],
-            current_weather['temperature'],
-            current_weather['humidity'],
-            current_weather['pressure'],
-            current_weather['wind_speed'],
-            current_weather['description']
-        )
-    except Exception as e:
-        st.warning(f"Could not save to database: {e}")
+    # Store current weather in database (unless it came from there)
+    if not reuse_latest:
+        try:
+            db.insert_weather_data(
+                current_weather['city'],
+                current_weather['temperature'],
+                current_weather['humidity'],
+                current_weather['pressure'],
+                current_weather['wind_speed'],
+                current_weather['description']
+            )
+        except Exception as e:
+            st.warning(f"Could not save to database: {e}")
 
 except Exception as e:
     st.error(f"Error fetching current weather: {e}")
 
-# Get historical data
-try:
-    historical_data = db.get_historical_data(selected_city, days)
-
-    if not historical_data.empty:
-        # Fix timestamp parsing - handle both with and without microseconds
-        def safe_parse_timestamp(ts):
-            if isinstance(ts, str):
-                # Try parsing with microseconds first, then without
-                try:
-                    return pd.to_datetime(ts, format='%Y-%m-%d %H:%M:%S.%f')
-                except ValueError:
-                    try:
-                        return pd.to_datetime(ts, format='%Y-%m-%d %H:%M:%S')
-                    except ValueError:
-                        # Fallback to pandas automatic parsing
-                        return pd.to_datetime(ts)
-            else:
-                return pd.to_datetime(ts)
-
-        historical_data['timestamp'] = historical_data['timestamp'].apply(safe_parse_timestamp)
-
-        # Create visualizations
-        st.subheader(f"📈 Historical Data - Last {days} Days")
-
-        # Create multiple tabs for different visualizations
-        tab1, tab2, tab3 = st.tabs(["📊 Temperature Analysis", "🌧️ Weather Patterns", "📋 Raw Data"])
-
-        with tab1:
-            # Temperature chart with trend line
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
-
-            # Temperature plot
-            ax1.plot(historical_data['timestamp'], historical_data['temperature'],
-                     marker='o', linewidth=2, color='red', alpha=0.7, label='Temperature')
-
-            # Add trend line (only if we have enough data points)
-            if len(historical_data) > 1:
+# Historical section runs as a fragment: its tabs and toggles rerun only this part of the page
+@st.fragment
+def render_history(city, days):
+    try:
+        snapshot = load_dashboard_snapshot(db, city, days)
+        historical_data = snapshot['history']
+
+        if not historical_data.empty:
+            # Create visualizations
+            st.subheader(f"📈 Historical Data - Last {days} Days")
+
+            # Create multiple tabs for different visualizations
+            tab1, tab2, tab3 = st.tabs(["📊 Temperature Analysis", "🌧️ Weather Patterns", "📋 Raw Data"])
+
+            with tab1:
+                # Heaviest panel, so it is only drawn when asked for (remembered in session state)
+                if st.toggle("Show temperature trend", value=False, key="show_temperature_trend"):
+                    # Add trend line (only if we have enough data points)
+                    trend = compute_trend(historical_data['temperature'].to_numpy())
+
+                    # Native charts are drawn in the browser, so nothing is rasterized here
+                    st.markdown(f"**Temperature Trend - {city}**")
+                    temp_chart = historical_data.set_index('timestamp')[['temperature']]
+                    temp_chart.columns = ['Temperature']
+                    if trend is not None:
+                        temp_chart['Trend'] = trend
+                    st.line_chart(temp_chart)
+
+                    # Humidity and Pressure on independent y-axes
+                    st.markdown("**Humidity & Pressure**")
+                    base = alt.Chart(historical_data).encode(x=alt.X('timestamp:T', title='Date'))
+                    humidity_line = base.mark_line(color='blue', point=True).encode(
+                        y=alt.Y('humidity:Q', title='Humidity (%)'))
+                    pressure_line = base.mark_line(color='green', point=True).encode(
+                        y=alt.Y('pressure:Q', title='Pressure (hPa)', scale=alt.Scale(zero=False)))
+                    st.altair_chart(alt.layer(humidity_line, pressure_line).resolve_scale(y='independent'),
+                                    use_container_width=True)
+
+                    # Original matplotlib figure, only rendered on request
+                    with st.expander("Advanced charts (matplotlib)"):
+                        if st.checkbox("Render matplotlib figure"):
+                            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
+
+                            # Temperature plot
+                            ax1.plot(historical_data['timestamp'], historical_data['temperature'],
+                                     marker='o', linewidth=2, color='red', alpha=0.7, label='Temperature')
+                            if trend is not None:
+                                ax1.plot(historical_data['timestamp'], trend,
+                                         '--', color='darkred', linewidth=1, label='Trend')
+
+                            ax1.set_title(f'Temperature Trend - {city}')
+                            ax1.set_ylabel('Temperature (°C)')
+                            ax1.legend()
+                            ax1.grid(True, alpha=0.3)
+                            ax1.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
+
+                            # Humidity and Pressure subplot
+                            ax2b = ax2.twinx()
+                            ax2.plot(historical_data['timestamp'], historical_data['humidity'],
+                                     marker='s', linewidth=2, color='blue', alpha=0.7, label='Humidity')
+                            ax2b.plot(historical_data['timestamp'], historical_data['pressure'],
+                                      marker='^', linewidth=2, color='green', alpha=0.7, label='Pressure')
+
+                            ax2.set_xlabel('Date')
+                            ax2.set_ylabel('Humidity (%)', color='blue')
+                            ax2b.set_ylabel('Pressure (hPa)', color='green')
+                            ax2.legend(loc='upper left')
+                            ax2b.legend(loc='upper right')
+                            ax2.grid(True, alpha=0.3)
+                            ax2.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
+
+                            plt.tight_layout()
+                            st.pyplot(fig)
+                            plt.close(fig)
+
+            with tab2:
+                # Weather patterns analysis
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    # Weather condition distribution, counted in SQL
+                    weather_counts = load_description_counts(db, city, days)
+                    if weather_counts:
+                        st.markdown("**Weather Condition Distribution**")
+                        st.bar_chart(pd.Series(weather_counts, name='count'))
+                    else:
+                        st.info("No weather condition data available")
+
+                with col2:
+                    # Wind speed distribution, binned in SQL (2 m/s bins)
+                    wind_counts = load_wind_speed_histogram(db, city, days)
+                    if wind_counts:
+                        st.markdown("**Wind Speed Distribution**")
+                        wind_chart = pd.Series(wind_counts, name='Frequency')
+                        wind_chart.index.name = 'Wind Speed (m/s)'
+                        st.bar_chart(wind_chart)
+                    else:
+                        st.info("No wind speed data available")
+
+            with tab3:
+                # Statistics
                 try:
-                    z = np.polyfit(range(len(historical_data)), historical_data['temperature'], 1)
-                    p = np.poly1d(z)
-                    ax1.plot(historical_data['timestamp'], p(range(len(historical_data))),
-                            '--', color='darkred', linewidth=1, label='Trend')
+                    city_stats = snapshot['stats']
+                    if city_stats:
+                        st.subheader("📊 City Statistics")
+                        cols = st.columns(4)
+                        stats_to_show = [
+                            ('avg_temperature', '🌡️ Avg Temp', '°C'),
+                            ('max_temperature', '🔥 Max Temp', '°C'),
+                            ('min_temperature', '❄️ Min Temp', '°C'),
+                            ('avg_humidity', '💧 Avg Humidity', '%')
+                        ]
+
+                        for (stat_key, stat_label, unit), col in zip(stats_to_show, cols):
+                            with col:
+                                value = city_stats.get(stat_key, 0)
+                                if isinstance(value, (int, float)):
+                                    st.metric(stat_label, f"{value:.1f}{unit}")
+                                else:
+                                    st.metric(stat_label, f"{value}{unit}")
                 except Exception as e:
-                    print(f"Could not create trend line: {e}")
-
-            ax1.set_title(f'Temperature Trend - {selected_city}')
-            ax1.set_ylabel('Temperature (°C)')
-            ax1.legend()
-            ax1.grid(True, alpha=0.3)
-            ax1.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-
-            # Humidity and Pressure subplot
-            ax2b = ax2.twinx()
-            ax2.plot(historical_data['timestamp'], historical_data['humidity'],
-                    marker='s', linewidth=2, color='blue', alpha=0.7, label='Humidity')
-            ax2b.plot(historical_data['timestamp'], historical_data['pressure'],
-                     marker='^', linewidth=2, color='green', alpha=0.7, label='Pressure')
-
-            ax2.set_xlabel('Date')
-            ax2.set_ylabel('Humidity (%)', color='blue')
-            ax2b.set_ylabel('Pressure (hPa)', color='green')
-            ax2.legend(loc='upper left')
-            ax2b.legend(loc='upper right')
-            ax2.grid(True, alpha=0.3)
-            ax2.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-
-            plt.tight_layout()
-            st.pyplot(fig)
-
-        with tab2:
-            # Weather patterns analysis
-            col1, col2 = st.columns(2)
-
-            with col1:
-                # Weather condition distribution
-                weather_counts = historical_data['description'].value_counts()
-                if not weather_counts.empty:
-                    fig2, ax2 = plt.subplots(figsize=(8, 6))
-                    weather_counts.plot(kind='pie', autopct='%1.1f%%', ax=ax2)
-                    ax2.set_title('Weather Condition Distribution')
-                    ax2.set_ylabel('')  # Remove default ylabel
-                    st.pyplot(fig2)
-                else:
-                    st.info("No weather condition data available")
-
-            with col2:
-                # Wind speed distribution
-                if 'wind_speed' in historical_data.columns and not historical_data['wind_speed'].empty:
-                    fig3, ax3 = plt.subplots(figsize=(8, 6))
-                    ax3.hist(historical_data['wind_speed'], bins=10, alpha=0.7, color='orange')
-                    ax3.set_title('Wind Speed Distribution')
-                    ax3.set_xlabel('Wind Speed (m/s)')
-                    ax3.set_ylabel('Frequency')
-                    ax3.grid(True, alpha=0.3)
-                    st.pyplot(fig3)
-                else:
-                    st.info("No wind speed data available")
-
-        with tab3:
-            # Statistics
-            try:
-                city_stats = db.get_city_statistics(selected_city)
-                if city_stats:
-                    st.subheader("📊 City Statistics")
-                    cols = st.columns(4)
-                    stats_to_show = [
-                        ('avg_temperature', '🌡️ Avg Temp', '°C'),
-                        ('max_temperature', '🔥 Max Temp', '°C'),
-                        ('min_temperature', '❄️ Min Temp', '°C'),
-                        ('avg_humidity', '💧 Avg Humidity', '%')
-                    ]
-
-                    for (stat_key, stat_label, unit), col in zip(stats_to_show, cols):
-                        with col:
-                            value = city_stats.get(stat_key, 0)
-                            if isinstance(value, (int, float)):
-                                st.metric(stat_label, f"{value:.1f}{unit}")
-                            else:
-                                st.metric(stat_label, f"{value}{unit}")
-            except Exception as e:
-                st.error(f"Error loading statistics: {e}")
-
-            # Raw data table
-            st.subheader("📋 Raw Data")
-            display_data = historical_data[['timestamp', 'temperature', 'humidity',
-                                          'pressure', 'wind_speed', 'description']].copy()
-            display_data['timestamp'] = display_data['timestamp'].dt.strftime('%Y-%m-%d %H:%M')
-            st.dataframe(display_data, use_container_width=True)
-
-            # Download data
-            csv = historical_data.to_csv(index=False)
-            st.download_button(
-                label="📥 Download CSV",
-                data=csv,
-                file_name=f"weather_data_{selected_city}_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
+                    st.error(f"Error loading statistics: {e}")
+
+                # Raw data table
+                st.subheader("📋 Raw Data")
+                display_data = historical_data[['timestamp', 'temperature', 'humidity',
+                                              'pressure', 'wind_speed', 'description']].copy()
+                display_data['timestamp'] = display_data['timestamp'].dt.strftime('%Y-%m-%d %H:%M')
+                st.dataframe(display_data, use_container_width=True)
+
+                # Download data
+                today = datetime.now().strftime('%Y%m%d')
+                csv = historical_data.to_csv(index=False)
+                st.download_button(
+                    label="📥 Download CSV",
+                    data=csv,
+                    file_name=f"weather_data_{city}_{today}.csv",
+                    mime="text/csv"
+                )
+
+        else:
+            st.info("ℹ️ No historical data available for the selected period.")
 
-    else:
-        st.info("ℹ️ No historical data available for the selected period.")
+    except Exception as e:
+        st.error(f"Error loading historical data: {e}")
+        # Debug information
+        if 'historical_data' in locals():
+            st.write("Sample timestamp values:")
+            st.write(historical_data['timestamp'].head().tolist())
 
-except Exception as e:
-    st.error(f"Error loading historical data: {e}")
-    # Debug information
-    if 'historical_data' in locals():
-        st.write("Sample timestamp values:")
-        st.write(historical_data['timestamp'].head().tolist())
+
+# Let the prefetch finish so render_history reads the snapshot from the cache
+wait([snapshot_future])
+render_history(selected_city, days)
 
 # Footer
 st.markdown("---")
@@ -1,44 +1,136 @@
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import random  # Add this import
 import numpy as np  # Add this import
 
+
+# DELETE ... RETURNING needs SQLite 3.35+; older libraries fall back to rowcount
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def _utc_now():
+    """Current UTC time as a naive datetime, matching SQLite's CURRENT_TIMESTAMP"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _cutoff_timestamp(days):
+    """UTC timestamp string for `days` ago, in SQLite's datetime() format"""
+    cutoff = _utc_now() - timedelta(days=days)
+    return cutoff.strftime('%Y-%m-%d %H:%M:%S')
+
+
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS weather_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT NOT NULL,
+        temperature REAL NOT NULL,
+        humidity INTEGER NOT NULL,
+        pressure INTEGER NOT NULL,
+        wind_speed REAL NOT NULL,
+        description TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Covering index: historical queries are answered from the index alone
+CREATE_INDEX_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_city_ts_cov
+    ON weather_data(city, timestamp, temperature, humidity, pressure, wind_speed, description)
+'''
+
+# Per-connection settings; journal_mode=WAL is stored in the database file itself
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA cache_size=-65536",  # 64 MB
+)
+
+# Idle read connections kept open for reuse across reruns and sessions
+READ_POOL_SIZE = 4
+
+# Columns returned by the historical query, in SELECT order
+HISTORY_COLUMNS = ['timestamp', 'temperature', 'humidity', 'pressure', 'wind_speed', 'description']
+
+# Compact dtypes for the historical frame; values stay well inside these ranges
+HISTORY_DTYPES = {
+    'temperature': 'float32',
+    'humidity': 'int16',
+    'pressure': 'int16',
+    'wind_speed': 'float32',
+    'description': 'category'
+}
+
+
 class WeatherDatabase:
     def __init__(self, db_name="weather_data.db"):
         self.db_name = db_name
+        self._conn = None
+        self._lock = threading.Lock()
+        self._read_pool = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+        # Bumped by writers after a commit that may change the city list
+        self._cities_generation = 0
+        self._cities_cache = None  # (generation, cities) as of the read that filled it
         self.init_database()
 
+    def _open_connection(self):
+        """Open an autocommit connection with the per-connection pragmas applied"""
+        conn = sqlite3.connect(self.db_name, check_same_thread=False, isolation_level=None)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _cached_cities(self):
+        """Get the memoised city list, or None if a write has made it stale"""
+        cache = self._cities_cache
+        if cache is not None and cache[0] == self._cities_generation:
+            return cache[1]
+        return None
+
+    def _invalidate_cities(self):
+        """Mark the memoised city list stale; call with the write lock held, after committing"""
+        self._cities_generation += 1
+        self._cities_cache = None
+
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_name)
+        """Get the shared write connection, opening it on first use (writers hold _lock)"""
+        if self._conn is None:
+            self._conn = self._open_connection()
+        return self._conn
+
+    @contextmanager
+    def read_connection(self):
+        """Borrow a pooled read connection; reads on it only ever see committed data"""
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            conn = self._open_connection()
+        try:
+            yield conn
+        finally:
+            try:
+                self._read_pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
 
     def init_database(self):
         """Initialize database and create tables"""
         conn = self.get_connection()
         cursor = conn.cursor()
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS weather_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                city TEXT NOT NULL,
-                temperature REAL NOT NULL,
-                humidity INTEGER NOT NULL,
-                pressure INTEGER NOT NULL,
-                wind_speed REAL NOT NULL,
-                description TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Create index for better performance
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_city_timestamp
-            ON weather_data(city, timestamp)
-        ''')
-
-        conn.commit()
-        conn.close()
+        # WAL lets the pooled readers run while a write is in progress
+        cursor.execute("PRAGMA journal_mode=WAL")
+
+        cursor.execute(CREATE_TABLE_SQL)
+        cursor.execute(CREATE_INDEX_SQL)
+
+        # The covering index has the same (city, timestamp) prefix, so the old index is redundant
+        cursor.execute("DROP INDEX IF EXISTS idx_city_timestamp")
+
         print("Database initialized successfully!")
 
     def insert_weather_data(self, city, temperature, humidity, pressure, wind_speed, description):
@@ -47,103 +139,185 @@ class WeatherDatabase:
         cursor = conn.cursor()
 
         try:
-            cursor.execute('''
-                INSERT INTO weather_data (city, temperature, humidity, pressure, wind_speed, description)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (city, temperature, humidity, pressure, wind_speed, description))
+            with self._lock:
+                cursor.execute('''
+                    INSERT INTO weather_data (city, temperature, humidity, pressure, wind_speed, description)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (city, temperature, humidity, pressure, wind_speed, description))
+                # Only a new city changes the list
+                cities = self._cached_cities()
+                if cities is None or city not in cities:
+                    self._invalidate_cities()
 
-            conn.commit()
             print(f"Weather data inserted for {city}")
 
         except Exception as e:
             print(f"Error inserting weather data: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
 
-    def get_historical_data(self, city, days=7):
-        """Get historical weather data for a city"""
-        conn = self.get_connection()
+    def _read_historical_data(self, conn, city, days):
+        """Run the historical query for a city on the given connection"""
+        # FIXED: Use parameter substitution correctly
+        query = '''
+            SELECT timestamp, temperature, humidity, pressure, wind_speed, description
+            FROM weather_data
+            WHERE city = ? AND timestamp >= ?
+            ORDER BY timestamp
+        '''
+
+        rows = conn.execute(query, (city, _cutoff_timestamp(days))).fetchall()
+        df = pd.DataFrame.from_records(rows, columns=HISTORY_COLUMNS)
+
+        # Timestamps are stored both with and without microseconds
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601', cache=True)
+        return df.astype(HISTORY_DTYPES)
+
+    def _read_city_statistics(self, conn, city):
+        """Run the statistics query for a city on the given connection"""
+        query = '''
+            SELECT
+                COUNT(*) as total_records,
+                AVG(temperature) as avg_temp,
+                MAX(temperature) as max_temp,
+                MIN(temperature) as min_temp,
+                AVG(humidity) as avg_humidity,
+                AVG(pressure) as avg_pressure,
+                AVG(wind_speed) as avg_wind_speed,
+                MAX(timestamp) as last_update
+            FROM weather_data
+            WHERE city = ?
+        '''
 
-        try:
-            # FIXED: Use parameter substitution correctly
-            query = '''
-                SELECT * FROM weather_data
-                WHERE city = ? AND timestamp >= datetime('now', '-' || ? || ' days')
-                ORDER BY timestamp
-            '''
+        cursor = conn.cursor()
+        cursor.execute(query, (city,))
+        result = cursor.fetchone()
 
-            df = pd.read_sql_query(query, conn, params=(city, days))
+        if result:
+            return {
+                'total_records': result[0],
+                'avg_temperature': round(result[1], 1) if result[1] else 0,
+                'max_temperature': round(result[2], 1) if result[2] else 0,
+                'min_temperature': round(result[3], 1) if result[3] else 0,
+                'avg_humidity': round(result[4], 1) if result[4] else 0,
+                'avg_pressure': round(result[5], 1) if result[5] else 0,
+                'avg_wind_speed': round(result[6], 1) if result[6] else 0,
+                'last_update': result[7]
+            }
+        return {}
+
+    def _read_latest_reading(self, conn, city):
+        """Get the newest reading for a city that is not in the future, or None"""
+        row = conn.execute('''
+            SELECT timestamp, temperature, humidity, pressure, wind_speed, description
+            FROM weather_data
+            WHERE city = ? AND timestamp <= ?
+            ORDER BY timestamp DESC
+            LIMIT 1
+        ''', (city, _cutoff_timestamp(0))).fetchone()
+
+        if row is None:
+            return None
+        latest = dict(zip(HISTORY_COLUMNS, row))
+        latest['timestamp'] = datetime.fromisoformat(latest['timestamp'])
+        latest['city'] = city
+        return latest
+
+    def get_latest_reading(self, city):
+        """Get the newest stored reading for a city (timestamp in UTC), or None"""
+        try:
+            with self.read_connection() as conn:
+                return self._read_latest_reading(conn, city)
 
-            if not df.empty:
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
+        except Exception as e:
+            print(f"Error fetching latest reading: {e}")
+            return None
 
-            return df
+    def get_historical_data(self, city, days=7):
+        """Get historical weather data for a city"""
+        try:
+            with self.read_connection() as conn:
+                return self._read_historical_data(conn, city, days)
 
         except Exception as e:
             print(f"Error fetching historical data: {e}")
             return pd.DataFrame()
-        finally:
-            conn.close()
 
     def get_all_cities(self):
         """Get list of all cities in database"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute("SELECT DISTINCT city FROM weather_data ORDER BY city")
-            cities = [row[0] for row in cursor.fetchall()]
-            return cities
+            cities = self._cached_cities()
+            if cities is None:
+                # Tag the list with the generation seen before reading, so a write
+                # committed during the query leaves it stale instead of current
+                generation = self._cities_generation
+                with self.read_connection() as conn:
+                    rows = conn.execute("SELECT DISTINCT city FROM weather_data ORDER BY city").fetchall()
+                cities = [row[0] for row in rows]
+                self._cities_cache = (generation, cities)
+            return list(cities)
 
         except Exception as e:
             print(f"Error fetching cities: {e}")
             return []
-        finally:
-            conn.close()
 
     def get_city_statistics(self, city):
         """Get statistical summary for a city"""
-        conn = self.get_connection()
+        try:
+            with self.read_connection() as conn:
+                return self._read_city_statistics(conn, city)
+
+        except Exception as e:
+            print(f"Error fetching city statistics: {e}")
+            return {}
 
+    def get_description_counts(self, city, days=7):
+        """Get number of records per weather description for a city"""
         try:
-            query = '''
-                SELECT
-                    COUNT(*) as total_records,
-                    AVG(temperature) as avg_temp,
-                    MAX(temperature) as max_temp,
-                    MIN(temperature) as min_temp,
-                    AVG(humidity) as avg_humidity,
-                    AVG(pressure) as avg_pressure,
-                    AVG(wind_speed) as avg_wind_speed,
-                    MAX(timestamp) as last_update
-                FROM weather_data
-                WHERE city = ?
-            '''
-
-            cursor = conn.cursor()
-            cursor.execute(query, (city,))
-            result = cursor.fetchone()
-
-            if result:
-                stats = {
-                    'total_records': result[0],
-                    'avg_temperature': round(result[1], 1) if result[1] else 0,
-                    'max_temperature': round(result[2], 1) if result[2] else 0,
-                    'min_temperature': round(result[3], 1) if result[3] else 0,
-                    'avg_humidity': round(result[4], 1) if result[4] else 0,
-                    'avg_pressure': round(result[5], 1) if result[5] else 0,
-                    'avg_wind_speed': round(result[6], 1) if result[6] else 0,
-                    'last_update': result[7]
-                }
-                return stats
+            with self.read_connection() as conn:
+                rows = conn.execute('''
+                    SELECT description, COUNT(*) FROM weather_data
+                    WHERE city = ? AND timestamp >= ?
+                    GROUP BY description
+                    ORDER BY COUNT(*) DESC
+                ''', (city, _cutoff_timestamp(days))).fetchall()
+                return dict(rows)
+
+        except Exception as e:
+            print(f"Error fetching description counts: {e}")
             return {}
 
+    def get_wind_speed_histogram(self, city, days=7, bin_width=2):
+        """Get wind speed record counts per bin, keyed by the bin's lower edge"""
+        try:
+            with self.read_connection() as conn:
+                rows = conn.execute('''
+                    SELECT CAST(wind_speed / ? AS INTEGER) AS bin, COUNT(*) FROM weather_data
+                    WHERE city = ? AND timestamp >= ?
+                    GROUP BY bin
+                    ORDER BY bin
+                ''', (bin_width, city, _cutoff_timestamp(days))).fetchall()
+                return {b * bin_width: count for b, count in rows}
+
         except Exception as e:
-            print(f"Error fetching city statistics: {e}")
+            print(f"Error fetching wind speed histogram: {e}")
             return {}
-        finally:
-            conn.close()
+
+    def get_dashboard_snapshot(self, city, days=7):
+        """Get history and statistics for a city in one read transaction"""
+        try:
+            with self.read_connection() as conn:
+                # Both queries see the same database state
+                conn.execute("BEGIN")
+                try:
+                    history = self._read_historical_data(conn, city, days)
+                    stats = self._read_city_statistics(conn, city)
+                finally:
+                    conn.execute("COMMIT")
+
+                return {'history': history, 'stats': stats}
+
+        except Exception as e:
+            print(f"Error fetching dashboard snapshot: {e}")
+            return {'history': pd.DataFrame(), 'stats': {}}
 
     def delete_old_data(self, days_old=30):
         """Delete data older than specified days"""
@@ -151,39 +325,39 @@ class WeatherDatabase:
         cursor = conn.cursor()
 
         try:
-            cursor.execute('''
-                DELETE FROM weather_data
-                WHERE timestamp < datetime('now', '-' || ? || ' days')
-            ''', (days_old,))
-
-            deleted_rows = cursor.rowcount
-            conn.commit()
+            with self._lock:
+                query = "DELETE FROM weather_data WHERE timestamp < ?"
+                if _HAS_RETURNING:
+                    # Count the returned ids as they stream past instead of collecting them
+                    cursor.execute(query + " RETURNING id", (_cutoff_timestamp(days_old),))
+                    deleted_rows = sum(1 for _ in cursor)
+                else:
+                    cursor.execute(query, (_cutoff_timestamp(days_old),))
+                    deleted_rows = cursor.rowcount
+                self._invalidate_cities()
             print(f"Deleted {deleted_rows} old records")
             return deleted_rows
 
         except Exception as e:
             print(f"Error deleting old data: {e}")
-            conn.rollback()
             return 0
-        finally:
-            conn.close()
 
     def generate_sample_data(self, days=30, records_per_day=3):
         """Generate comprehensive sample weather data"""
         cities = ["New York", "London", "Tokyo", "Sydney", "Paris", "Berlin", "Mumbai"]
 
-        # Clear existing data
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM weather_data")
-        conn.commit()
-        conn.close()
+        from weather_api import WeatherAPI
+        weather_api = WeatherAPI(use_mock=True)
 
         print(f"Generating {days} days of sample data for {len(cities)} cities...")
 
-        # Generate sample data
+        # Lay out every (city, timestamp) slot, then draw all weather values at once
+        row_cities = []
+        row_times = []
+        row_temp_adjust = []
         for day in range(days):
-            current_date = datetime.now() - timedelta(days=days-day-1)
+            # UTC, like the CURRENT_TIMESTAMP used for live readings
+            current_date = _utc_now() - timedelta(days=days-day-1)
 
             for city in cities:
                 # Generate multiple records per day to simulate different times
@@ -196,69 +370,79 @@ class WeatherDatabase:
                     else:  # Evening
                         temp_adjust = -1
 
-                    # Get base mock data
-                    from weather_api import WeatherAPI
-                    weather_api = WeatherAPI(use_mock=True)
-                    weather_data = weather_api._get_mock_weather_data(city)
-
-                    # Adjust temperature for time of day
-                    weather_data['temperature'] += temp_adjust
-
                     # Create specific timestamp
                     specific_time = current_date.replace(
                         hour=8 + record * 6,  # 8AM, 2PM, 8PM
                         minute=random.randint(0, 59)
                     )
 
-                    # Insert with specific timestamp
-                    self._insert_with_timestamp(
-                        weather_data['city'],
-                        weather_data['temperature'],
-                        weather_data['humidity'],
-                        weather_data['pressure'],
-                        weather_data['wind_speed'],
-                        weather_data['description'],
-                        specific_time
-                    )
-
-        print("Sample data generation completed!")
-
-    def _insert_with_timestamp(self, city, temperature, humidity, pressure, wind_speed, description, timestamp):
-        """Insert data with specific timestamp"""
+                    row_cities.append(city)
+                    row_times.append(specific_time)
+                    row_temp_adjust.append(temp_adjust)
+
+        batch = weather_api._get_mock_weather_batch(row_cities, row_times)
+        temperatures = batch['temperature'] + np.array(row_temp_adjust)
+
+        # tolist() hands sqlite3 plain Python ints/floats instead of numpy scalars
+        rows = list(zip(
+            row_cities,
+            temperatures.round(1).tolist(),
+            batch['humidity'].tolist(),
+            batch['pressure'].tolist(),
+            batch['wind_speed'].tolist(),
+            batch['description'].tolist(),
+            row_times
+        ))
+
+        # Recreate the table and insert the new rows in one transaction.
+        # Mock data is disposable, so skip fsyncs while loading it.
         conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO weather_data (city, temperature, humidity, pressure, wind_speed, description, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (city, temperature, humidity, pressure, wind_speed, description, timestamp))
+        with self._lock:
+            conn.execute("PRAGMA synchronous=OFF")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                # One schema reset instead of deleting row by row; the index comes after the load
+                conn.execute("DROP TABLE IF EXISTS weather_data")
+                conn.execute(CREATE_TABLE_SQL)
+                conn.executemany('''
+                    INSERT INTO weather_data (city, temperature, humidity, pressure, wind_speed, description, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                # Building the index once after the load is cheaper than maintaining it per row
+                conn.execute(CREATE_INDEX_SQL)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.execute("PRAGMA synchronous=NORMAL")
+
+            # The new data is committed from here on
+            self._invalidate_cities()
+            conn.execute("ANALYZE")
 
-        conn.commit()
-        conn.close()
+        print("Sample data generation completed!")
 
     def get_database_stats(self):
         """Get overall database statistics"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute("SELECT COUNT(*) FROM weather_data")
-            total_records = cursor.fetchone()[0]
+            with self.read_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM weather_data")
+                total_records = cursor.fetchone()[0]
 
-            cursor.execute("SELECT COUNT(DISTINCT city) FROM weather_data")
-            total_cities = cursor.fetchone()[0]
+                cursor.execute("SELECT COUNT(DISTINCT city) FROM weather_data")
+                total_cities = cursor.fetchone()[0]
 
-            cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM weather_data")
-            date_range = cursor.fetchone()
+                cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM weather_data")
+                date_range = cursor.fetchone()
 
-            return {
-                'total_records': total_records,
-                'total_cities': total_cities,
-                'date_range': date_range
-            }
+                return {
+                    'total_records': total_records,
+                    'total_cities': total_cities,
+                    'date_range': date_range
+                }
 
         except Exception as e:
             print(f"Error getting database stats: {e}")
-            return {}
-        finally:
-            conn.close()
\ No newline at end of file
+            return {}
\ No newline at end of file
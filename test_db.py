@@ -12,4 +12,29 @@ print("Available cities:", cities)
 
 # Check database stats
 stats = db.get_database_stats()
-print("Database stats:", stats)
\ No newline at end of file
+print("Database stats:", stats)
+
+# Check the aggregate helpers against the raw history
+city = cities[0]
+history = db.get_historical_data(city, days=7)
+
+description_counts = db.get_description_counts(city, days=7)
+print(f"Description counts for {city}:", description_counts)
+expected_counts = {desc: n for desc, n in history['description'].value_counts().items() if n}
+assert description_counts == expected_counts
+
+wind_histogram = db.get_wind_speed_histogram(city, days=7)
+print(f"Wind speed histogram for {city}:", wind_histogram)
+assert sum(wind_histogram.values()) == len(history)
+
+snapshot = db.get_dashboard_snapshot(city, days=7)
+print(f"Snapshot records for {city}:", len(snapshot['history']))
+assert len(snapshot['history']) == len(history)
+assert snapshot['stats']['total_records'] >= len(history)
+
+# Unknown cities come back empty
+assert db.get_description_counts("Atlantis") == {}
+assert db.get_wind_speed_histogram("Atlantis") == {}
+empty_snapshot = db.get_dashboard_snapshot("Atlantis")
+assert empty_snapshot['history'].empty
+print("Aggregate checks passed")
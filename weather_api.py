@@ -1,11 +1,75 @@
 import requests
+from requests.adapters import HTTPAdapter
 import random
+import numpy as np
 from datetime import datetime
+from itertools import accumulate
+from types import MappingProxyType
+
+# Mock weather tables, all indexed by weather code
+_WEATHER_KEYS = ("Clear", "Cloudy", "Rain", "Snow", "Fog", "Thunderstorm")
+
+# Weighted random selection for more realistic weather distribution
+_WEATHER_WEIGHTS = (0.3, 0.4, 0.15, 0.05, 0.05, 0.05)
+_WEATHER_CUM_WEIGHTS = tuple(accumulate(_WEATHER_WEIGHTS))
+_WEATHER_CODES = range(len(_WEATHER_KEYS))
+
+# Temperature offsets from the seasonal base range; Snow uses an absolute range
+_SNOW = _WEATHER_KEYS.index("Snow")
+_SNOW_TEMP_RANGE = (-10, 5)
+_TEMP_OFFSETS = ((5, 0), (0, -5), (-2, -8), (0, 0), (0, -3), (0, -5))
+_HUMIDITY_RANGES = ((30, 60), (50, 80), (70, 95), (60, 85), (80, 98), (75, 98))
+_PRESSURE_RANGES = ((1010, 1030), (1000, 1020), (980, 1010), (990, 1020), (1005, 1025), (970, 1005))
+_WIND_RANGES = ((0, 10), (5, 15), (10, 25), (5, 20), (0, 5), (15, 35))
+
+# Base temperature range by month (index 0 unused), northern hemisphere seasons
+_BASE_TEMP_BY_MONTH = (
+    None,
+    (-10, 10), (-10, 10),                   # Jan, Feb: Winter
+    (5, 25), (5, 25), (5, 25),              # Spring
+    (15, 35), (15, 35), (15, 35),           # Summer
+    (5, 20), (5, 20), (5, 20),              # Fall
+    (-10, 10)                               # Dec: Winter
+)
+
+# City-specific (temp_adjust, humidity_adjust)
+_CITY_ADJUSTMENTS = MappingProxyType({
+    "New York": (0, 5),
+    "London": (-5, 10),
+    "Tokyo": (3, 15),
+    "Sydney": (8, -5),
+    "Paris": (-2, 0),
+    "Berlin": (-3, -2),
+    "Mumbai": (15, 25)
+})
+_DEFAULT_ADJUSTMENT = (0, 0)
+
+# numpy views of the same tables for batch generation
+_MOCK_WEATHER_TYPES = np.array(_WEATHER_KEYS)
+_MOCK_WEATHER_WEIGHTS = np.array(_WEATHER_WEIGHTS)
+_MOCK_TEMP_LOW_OFFSET, _MOCK_TEMP_HIGH_OFFSET = np.array(_TEMP_OFFSETS).T
+_MOCK_HUMIDITY_LOW, _MOCK_HUMIDITY_HIGH = np.array(_HUMIDITY_RANGES).T
+_MOCK_PRESSURE_LOW, _MOCK_PRESSURE_HIGH = np.array(_PRESSURE_RANGES).T
+_MOCK_WIND_LOW, _MOCK_WIND_HIGH = np.array(_WIND_RANGES).T
+_MOCK_BASE_TEMP_LOW, _MOCK_BASE_TEMP_HIGH = np.array([(0, 0)] + list(_BASE_TEMP_BY_MONTH[1:])).T
+
 
 class WeatherAPI:
     def __init__(self, use_mock=True, api_key=None):
         self.use_mock = use_mock
         self.api_key = api_key
+        self._rng = np.random.default_rng()
+        self._session = None  # Created on the first real API call
+
+    def _get_session(self):
+        """Get the HTTP session, reusing its connections across calls"""
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
 
     def get_current_weather(self, city):
         """Get current weather data - uses mock data for POC"""
@@ -17,104 +81,23 @@ class WeatherAPI:
     def _get_mock_weather_data(self, city):
         """Generate realistic mock weather data based on city and season"""
         # Seasonal adjustments
-        now = datetime.now()
-        month = now.month
-
-        # Base temperature ranges by season (for northern hemisphere)
-        if month in [12, 1, 2]:  # Winter
-            base_temp_range = (-10, 10)
-        elif month in [3, 4, 5]:  # Spring
-            base_temp_range = (5, 25)
-        elif month in [6, 7, 8]:  # Summer
-            base_temp_range = (15, 35)
-        else:  # Fall
-            base_temp_range = (5, 20)
-
-        # City-specific adjustments
-        city_adjustments = {
-            "New York": {"temp_adjust": 0, "humidity_adjust": 5},
-            "London": {"temp_adjust": -5, "humidity_adjust": 10},
-            "Tokyo": {"temp_adjust": 3, "humidity_adjust": 15},
-            "Sydney": {"temp_adjust": 8, "humidity_adjust": -5},
-            "Paris": {"temp_adjust": -2, "humidity_adjust": 0},
-            "Berlin": {"temp_adjust": -3, "humidity_adjust": -2},
-            "Mumbai": {"temp_adjust": 15, "humidity_adjust": 25}
-        }
-
-        adjustment = city_adjustments.get(city, {"temp_adjust": 0, "humidity_adjust": 0})
-
-        weather_patterns = {
-            "Clear": {
-                "temp_range": (base_temp_range[0] + 5 + adjustment["temp_adjust"],
-                              base_temp_range[1] + adjustment["temp_adjust"]),
-                "humidity_range": (30 + adjustment["humidity_adjust"],
-                                  60 + adjustment["humidity_adjust"]),
-                "pressure_range": (1010, 1030),
-                "wind_range": (0, 10)
-            },
-            "Cloudy": {
-                "temp_range": (base_temp_range[0] + adjustment["temp_adjust"],
-                              base_temp_range[1] - 5 + adjustment["temp_adjust"]),
-                "humidity_range": (50 + adjustment["humidity_adjust"],
-                                  80 + adjustment["humidity_adjust"]),
-                "pressure_range": (1000, 1020),
-                "wind_range": (5, 15)
-            },
-            "Rain": {
-                "temp_range": (base_temp_range[0] - 2 + adjustment["temp_adjust"],
-                              base_temp_range[1] - 8 + adjustment["temp_adjust"]),
-                "humidity_range": (70 + adjustment["humidity_adjust"],
-                                  95 + adjustment["humidity_adjust"]),
-                "pressure_range": (980, 1010),
-                "wind_range": (10, 25)
-            },
-            "Snow": {
-                "temp_range": (-10 + adjustment["temp_adjust"],
-                              5 + adjustment["temp_adjust"]),
-                "humidity_range": (60 + adjustment["humidity_adjust"],
-                                  85 + adjustment["humidity_adjust"]),
-                "pressure_range": (990, 1020),
-                "wind_range": (5, 20)
-            },
-            "Fog": {
-                "temp_range": (base_temp_range[0] + adjustment["temp_adjust"],
-                              base_temp_range[1] - 3 + adjustment["temp_adjust"]),
-                "humidity_range": (80 + adjustment["humidity_adjust"],
-                                  98 + adjustment["humidity_adjust"]),
-                "pressure_range": (1005, 1025),
-                "wind_range": (0, 5)
-            },
-            "Thunderstorm": {
-                "temp_range": (base_temp_range[0] + adjustment["temp_adjust"],
-                              base_temp_range[1] - 5 + adjustment["temp_adjust"]),
-                "humidity_range": (75 + adjustment["humidity_adjust"],
-                                  98 + adjustment["humidity_adjust"]),
-                "pressure_range": (970, 1005),
-                "wind_range": (15, 35)
-            }
-        }
+        base_low, base_high = _BASE_TEMP_BY_MONTH[datetime.now().month]
+        temp_adjust, humidity_adjust = _CITY_ADJUSTMENTS.get(city, _DEFAULT_ADJUSTMENT)
 
-        # Weighted random selection for more realistic weather distribution
-        weather_weights = {
-            "Clear": 0.3,
-            "Cloudy": 0.4,
-            "Rain": 0.15,
-            "Snow": 0.05,
-            "Fog": 0.05,
-            "Thunderstorm": 0.05
-        }
-
-        description = random.choices(
-            list(weather_weights.keys()),
-            weights=list(weather_weights.values())
-        )[0]
+        code = random.choices(_WEATHER_CODES, cum_weights=_WEATHER_CUM_WEIGHTS)[0]
+        description = _WEATHER_KEYS[code]
 
-        pattern = weather_patterns[description]
+        if code == _SNOW:
+            temp_low, temp_high = _SNOW_TEMP_RANGE
+        else:
+            low_offset, high_offset = _TEMP_OFFSETS[code]
+            temp_low, temp_high = base_low + low_offset, base_high + high_offset
+        humidity_low, humidity_high = _HUMIDITY_RANGES[code]
 
-        temperature = random.uniform(*pattern["temp_range"])
-        humidity = random.randint(*pattern["humidity_range"])
-        pressure = random.randint(*pattern["pressure_range"])
-        wind_speed = random.uniform(*pattern["wind_range"])
+        temperature = random.uniform(temp_low + temp_adjust, temp_high + temp_adjust)
+        humidity = random.randint(humidity_low + humidity_adjust, humidity_high + humidity_adjust)
+        pressure = random.randint(*_PRESSURE_RANGES[code])
+        wind_speed = random.uniform(*_WIND_RANGES[code])
 
         return {
             "city": city,
@@ -126,6 +109,47 @@ class WeatherAPI:
             "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
 
+    def _get_mock_weather_batch(self, cities, timestamps):
+        """Generate mock weather for many (city, timestamp) pairs at once
+
+        Draws every value with numpy in one pass; the season is taken from each
+        timestamp's month. Returns a dict of arrays, one entry per input row.
+        """
+        n = len(cities)
+        rng = self._rng
+
+        months = np.fromiter((ts.month for ts in timestamps), dtype=np.int64, count=n)
+
+        # Look adjustments up once per distinct city, then broadcast by index
+        unique_cities, city_idx = np.unique(np.asarray(cities), return_inverse=True)
+        adjustments = [_CITY_ADJUSTMENTS.get(c, _DEFAULT_ADJUSTMENT) for c in unique_cities]
+        temp_adjust = np.take([a[0] for a in adjustments], city_idx)
+        humidity_adjust = np.take([a[1] for a in adjustments], city_idx)
+
+        codes = rng.choice(len(_MOCK_WEATHER_TYPES), size=n, p=_MOCK_WEATHER_WEIGHTS)
+        is_snow = codes == _SNOW
+
+        temp_low = np.where(is_snow, _SNOW_TEMP_RANGE[0],
+                            np.take(_MOCK_BASE_TEMP_LOW, months) + np.take(_MOCK_TEMP_LOW_OFFSET, codes))
+        temp_high = np.where(is_snow, _SNOW_TEMP_RANGE[1],
+                             np.take(_MOCK_BASE_TEMP_HIGH, months) + np.take(_MOCK_TEMP_HIGH_OFFSET, codes))
+
+        temperature = rng.uniform(temp_low + temp_adjust, temp_high + temp_adjust)
+        humidity = rng.integers(np.take(_MOCK_HUMIDITY_LOW, codes) + humidity_adjust,
+                                np.take(_MOCK_HUMIDITY_HIGH, codes) + humidity_adjust + 1)
+        pressure = rng.integers(np.take(_MOCK_PRESSURE_LOW, codes),
+                                np.take(_MOCK_PRESSURE_HIGH, codes) + 1)
+        wind_speed = rng.uniform(np.take(_MOCK_WIND_LOW, codes), np.take(_MOCK_WIND_HIGH, codes))
+
+        return {
+            "city": np.asarray(cities),
+            "temperature": np.round(temperature, 1),
+            "humidity": humidity,
+            "pressure": pressure,
+            "wind_speed": np.round(wind_speed, 1),
+            "description": np.take(_MOCK_WEATHER_TYPES, codes)
+        }
+
     def _get_real_weather_data(self, city):
         """Get real weather data from OpenWeatherMap API"""
         try:
@@ -136,7 +160,7 @@ class WeatherAPI:
                 'units': 'metric'
             }
 
-            response = requests.get(url, params=params, timeout=10)
+            response = self._get_session().get(url, params=params, timeout=10)
 
             if response.status_code == 200:
                 data = response.json()
@@ -161,12 +185,23 @@ class WeatherAPI:
 
     def get_weather_forecast(self, city, days=5):
         """Get weather forecast (mock implementation)"""
+        now = datetime.now()
+        batch = self._get_mock_weather_batch([city] * days, [now] * days)
+        # Adjust temperature slightly for forecast days
+        temperatures = batch['temperature'] + self._rng.uniform(-2, 2, size=days)
+        timestamp = now.strftime('%Y-%m-%d %H:%M:%S')
+
         forecast = []
         for i in range(days):
-            daily_weather = self._get_mock_weather_data(city)
-            # Adjust temperature slightly for forecast days
-            daily_weather['temperature'] += random.uniform(-2, 2)
-            daily_weather['day'] = i + 1
-            forecast.append(daily_weather)
+            forecast.append({
+                "city": city,
+                "temperature": float(temperatures[i]),
+                "humidity": int(batch['humidity'][i]),
+                "pressure": int(batch['pressure'][i]),
+                "wind_speed": float(batch['wind_speed'][i]),
+                "description": str(batch['description'][i]),
+                "timestamp": timestamp,
+                "day": i + 1
+            })
 
         return forecast
\ No newline at end of file